@@ -1,15 +1,25 @@
+from io import StringIO
 from pathlib import Path
 import re
 
+# Compiled once at import: re.split() recompiled this on every call.
+_CODEBLOCK_RE = re.compile(r"```.*?```", re.DOTALL)
+
 
 # Function to add visual breaks outside code blocks
 def add_visual_breaks(md: str) -> str:
-    parts = re.split(r"(```.*?```)", md, flags=re.DOTALL)
-    for i in range(0, len(parts), 2):  # only transform non-code parts
-        parts[i] = parts[i].replace("\\n\\n", "  <br><br>")
-    return "".join(parts)
+    sink = StringIO()
+    pos = 0
+    for match in _CODEBLOCK_RE.finditer(md):
+        # transform only the non-code span before this code block
+        sink.write(md[pos:match.start()].replace("\\n\\n", "  <br><br>"))
+        sink.write(match.group())
+        pos = match.end()
+    sink.write(md[pos:].replace("\\n\\n", "  <br><br>"))
+    return sink.getvalue()
 
 
-Path("./CLIENT_SIDE_IMPLEMENTATION_ROADMAP.md").write_text(
-    add_visual_breaks(Path("./CLIENT_SIDE_IMPLEMENTATION_ROADMAP.md").read_text())
-)
+if __name__ == "__main__":
+    Path("./CLIENT_SIDE_IMPLEMENTATION_ROADMAP.md").write_text(
+        add_visual_breaks(Path("./CLIENT_SIDE_IMPLEMENTATION_ROADMAP.md").read_text())
+    )
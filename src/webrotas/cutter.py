@@ -1,125 +1,273 @@
 # cutter.py
-import json
+import math
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List
+import numpy as np
+import orjson
 import osmium as osm
-from shapely.geometry import shape
+import osmium.filter
+import shapely
 from shapely.strtree import STRtree
-from shapely import wkb as shapely_wkb
 import logging
 
 # Configurable penalty factors (can be overridden via environment variables)
 INSIDE_FACTOR = float(os.getenv("AVOIDZONE_INSIDE_FACTOR", "0.02"))
 TOUCH_FACTOR = float(os.getenv("AVOIDZONE_TOUCH_FACTOR", "0.10"))
 
+# Penalty tag pairs, formatted once instead of per penalized way.
+_INSIDE_TAGS = [("avoid_zone", "yes"), ("avoid_factor", f"{INSIDE_FACTOR:.4f}")]
+_TOUCH_TAGS = [("avoid_zone", "yes"), ("avoid_factor", f"{TOUCH_FACTOR:.4f}")]
+
+# Number of candidate ways classified per vectorized STRtree query.
+# Larger batches amortize the per-call GEOS setup and give the vertex
+# contains_xy pass and the thread pool more work per drain; 50k ways is
+# on the order of tens of MB of buffered copies, well within budget for
+# a job that holds a node location store anyway.
+WAY_BATCH_SIZE = 50_000
+
+# Worker threads for the GEOS classification of each batch. shapely 2.x
+# releases the GIL inside vectorized STRtree queries, so the predicate
+# work scales across cores even from threads.
+CLASSIFY_THREADS = int(os.getenv("AVOIDZONE_THREADS", str(os.cpu_count() or 1)))
+
 logger = logging.getLogger(__name__)
 
 
 def _load_polys(geojson_path: Path):
-    gj = json.loads(geojson_path.read_text(encoding="utf-8"))
+    # Parse through a read-only mmap: orjson reads the page cache in
+    # place instead of materializing a bytes copy of a file that can be
+    # hundreds of MB.
+    with open(geojson_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("Empty avoidzones GeoJSON file.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            gj = orjson.loads(memoryview(mm))
     feats = gj["features"] if gj.get("type") == "FeatureCollection" else [gj]
-    polys = [
-        shape(f["geometry"])
-        for f in feats
-        if f.get("geometry") and f["geometry"]["type"] in ("Polygon", "MultiPolygon")
-    ]
-    if not polys:
+
+    # Build all geometries in one vectorized from_geojson call and filter
+    # by GEOS type id (3=Polygon, 6=MultiPolygon) instead of constructing
+    # them one at a time with shape().
+    payloads = [orjson.dumps(f["geometry"]) for f in feats if f.get("geometry")]
+    if payloads:
+        geoms = shapely.from_geojson(np.asarray(payloads, dtype=object))
+        # Keep the object ndarray: every downstream consumer (prepare,
+        # STRtree, the fancy-indexed gathers in _classify) takes the
+        # array wholesale, so converting to a Python list would only buy
+        # per-element indexing back in the hot path.
+        polys = geoms[np.isin(shapely.get_type_id(geoms), [3, 6])]
+    else:
+        polys = np.empty(0, dtype=object)
+    if not len(polys):
         raise ValueError("No (Multi)Polygon features in avoidzones GeoJSON.")
-    return polys, STRtree(polys)
+    # Prepare every polygon once: GEOS builds a per-geometry segment index
+    # that accelerates the millions of within/intersects evaluations the
+    # tree queries run against these same polygons.
+    shapely.prepare(polys)
+    # Scale the leaf fanout with the polygon count: sqrt(n) clamped to
+    # [8, 16] keeps the tree shallow for a handful of zones while giving
+    # large sets enough branching to prune per-query traversals.
+    node_capacity = max(8, min(16, int(math.sqrt(len(polys)))))
+    return polys, STRtree(polys, node_capacity=node_capacity)
+
 
+class Penalizer:
+    """
+    Tag highway/ferry ways that fall inside avoid zone polygons.
+
+    Candidate ways are buffered and classified in batches: one
+    tree.query(lines, predicate=...) call runs the predicate for the
+    whole batch in the GEOS C layer, instead of a Python loop doing a
+    query plus per-polygon within/intersects calls for every way.
+
+    Only ways pre-filtered by key reach way(); everything else is
+    written by the FileProcessor's C++ passthrough in apply_penalties.
+    """
 
-class Penalizer(osm.SimpleHandler):
-    def __init__(self, writer, polys: List, tree: STRtree):
-        super().__init__()
+    def __init__(self, writer, polys: np.ndarray, tree: STRtree):
         self.w = writer
-        self.polys = polys
+        # Object ndarray of polygons, straight from _load_polys: the
+        # tree-hit gathers in _classify fancy-index it without a
+        # per-element Python list lookup.
+        self.polys = np.asarray(polys, dtype=object)
         self.tree = tree
-        self.wkbf = osm.geom.WKBFactory()
+        # Union of all zones, prepared so contains_xy runs against a point
+        # locator index; used to classify way vertices in bulk before any
+        # line-vs-polygon predicate.
+        self.union = shapely.union_all(self.polys)
+        shapely.prepare(self.union)
+        # Polygon MBRs for the filter-and-refine step in _classify: four
+        # float comparisons reject most candidate pairs before any exact
+        # GEOS predicate runs.
+        self._poly_bounds = shapely.bounds(self.polys)
         self._way_count = 0
         self._penalized_count = 0
+        # Candidate ways awaiting classification: detached mutable copies
+        # (the handler argument is only valid during the callback) plus
+        # their (n, 2) coordinate arrays, in arrival order.
+        self._pending_ways = []
+        self._pending_coords = []
+        self._pool = (
+            ThreadPoolExecutor(max_workers=CLASSIFY_THREADS)
+            if CLASSIFY_THREADS > 1
+            else None
+        )
 
-    def node(self, n):
-        self.w.add_node(n)
+    def close(self):
+        """Release the classification thread pool."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
 
-    def relation(self, r):
-        self.w.add_relation(r)
+    @staticmethod
+    def _detached_way(w):
+        """Copy a way out of the osmium buffer so it survives the callback."""
+        return osm.osm.mutable.Way(
+            w,
+            tags=[(t.k, t.v) for t in w.tags],
+            nodes=[n.ref for n in w.nodes],
+        )
 
     def way(self, w):
         self._way_count += 1
         if self._way_count % 500000 == 0:
             logger.info(
-                "Processed %d ways (penalized=%d)",
+                "Processed %d candidate ways (penalized=%d)",
                 self._way_count,
                 self._penalized_count,
             )
 
-        kv = dict(w.tags)
-        if "highway" not in kv and kv.get("route") != "ferry":
+        # Probe the osmium TagList directly: materializing dict(w.tags)
+        # for every way just to test two keys costs a dict plus string
+        # copies on the fast path that handles most of the file.
+        tags = w.tags
+        if "highway" not in tags and tags.get("route") != "ferry":
+            self.w.add_way(w)
+            return
+
+        # Read node locations straight into a float64 array. Going through
+        # WKBFactory would serialize and re-parse every way's geometry;
+        # this hands the raw coordinates to shapely's vectorized
+        # constructor at flush time instead.
+        nodes = w.nodes
+        if len(nodes) < 2:
             self.w.add_way(w)
             return
         try:
-            wkb = self.wkbf.create_linestring(w)
+            # A flat generator into np.fromiter is the cheapest pure-Python
+            # extraction pyosmium allows; everything downstream of it runs
+            # in compiled shapely/GEOS ufuncs.
+            coords = np.fromiter(
+                (c for nd in nodes for c in (nd.location.lon, nd.location.lat)),
+                dtype=np.float64,
+                count=2 * len(nodes),
+            ).reshape(-1, 2)
         except Exception as e:
-            logger.debug("Failed to create linestring for way %d: %s", w.id, str(e))
+            logger.debug("Invalid location in way %d: %s", w.id, str(e))
             self.w.add_way(w)
             return
 
-        line = shapely_wkb.loads(wkb, hex=False)
-        candidate_indices = self.tree.query(line)
-        if len(candidate_indices) == 0:
-            self.w.add_way(w)
-            return
+        self._pending_ways.append(self._detached_way(w))
+        self._pending_coords.append(coords)
+        if len(self._pending_ways) >= WAY_BATCH_SIZE:
+            self.flush()
 
-        # Determine penalty: check if way is inside or touching avoid zones
-        # INSIDE_FACTOR (0.02) is most restrictive, applied when way is completely within polygon
-        # TOUCH_FACTOR (0.10) is applied when way only touches/crosses polygon boundary
-        is_inside = False
-        is_touching = False
-        penalty_reason = None
-
-        for idx in candidate_indices:
-            p = self.polys[idx]
-            if line.within(p):
-                # Way is completely inside polygon - most restrictive penalty
-                is_inside = True
-                break  # Can stop checking since INSIDE is most restrictive
-            elif p.intersects(line):
-                # Way touches or crosses polygon boundary
-                is_touching = True
-                # Continue checking other polygons to see if any fully contain the way
-
-        # Apply most restrictive penalty
-        if is_inside:
-            factor = INSIDE_FACTOR
-            penalty_reason = "INSIDE"
-        elif is_touching:
-            factor = TOUCH_FACTOR
-            penalty_reason = "TOUCHING"
-        else:
-            factor = None
-            penalty_reason = None
+    def _classify(self, lines: np.ndarray) -> np.ndarray:
+        """
+        Return the penalty factor per line (0 where no penalty applies).
 
-        # No penalty if way doesn't intersect avoid zones
-        if factor is None:
-            self.w.add_way(w)
+        INSIDE_FACTOR (0.02) is most restrictive, applied when a way lies
+        completely within a polygon; TOUCH_FACTOR (0.10) when it only
+        touches/crosses a polygon boundary. Setting the intersects hits
+        first and overwriting with the within hits keeps the most
+        restrictive factor per way.
+
+        A vectorized point-in-union test over all way vertices prunes the
+        line predicates: a way with a vertex inside the union definitely
+        intersects (tested for within only), while one with no vertex
+        inside rarely does (tested for intersects only, catching ways
+        that cross a zone between two outside vertices).
+        """
+        coords, line_idx = shapely.get_coordinates(lines, return_index=True)
+        vertex_in = shapely.contains_xy(self.union, coords[:, 0], coords[:, 1])
+        any_in = np.bincount(line_idx, weights=vertex_in, minlength=len(lines)) > 0
+
+        factors = np.zeros(len(lines))
+        factors[any_in] = TOUCH_FACTOR
+
+        out_idx = np.flatnonzero(~any_in)
+        if len(out_idx):
+            hits = self.tree.query(lines[out_idx], predicate="intersects")[0]
+            factors[out_idx[hits]] = TOUCH_FACTOR
+
+        in_idx = np.flatnonzero(any_in)
+        if len(in_idx):
+            # Filter-and-refine for within: a line can only lie within a
+            # polygon whose MBR contains the line's MBR, so reject the
+            # envelope-overlap-only pairs with four vectorized float
+            # comparisons before running the exact GEOS predicate.
+            in_lines = lines[in_idx]
+            src, tgt = self.tree.query(in_lines)
+            lb = shapely.bounds(in_lines)[src]
+            pb = self._poly_bounds[tgt]
+            mbr_ok = (
+                (pb[:, 0] <= lb[:, 0])
+                & (pb[:, 1] <= lb[:, 1])
+                & (pb[:, 2] >= lb[:, 2])
+                & (pb[:, 3] >= lb[:, 3])
+            )
+            src, tgt = src[mbr_ok], tgt[mbr_ok]
+            if len(src):
+                within = shapely.within(in_lines[src], self.polys[tgt])
+                factors[in_idx[np.unique(src[within])]] = INSIDE_FACTOR
+        return factors
+
+    def flush(self):
+        """Classify and write all buffered candidate ways."""
+        if not self._pending_ways:
             return
 
-        self._penalized_count += 1
-        logger.debug(
-            "Penalizing way %d: factor=%.4f reason=%s highway=%s",
-            w.id,
-            factor,
-            penalty_reason,
-            kv.get("highway", "unknown"),
+        # Build all line geometries in one vectorized call from the flat
+        # coordinate array, partitioned by the per-way indices.
+        counts = np.fromiter(
+            (len(c) for c in self._pending_coords),
+            dtype=np.intp,
+            count=len(self._pending_coords),
+        )
+        lines = shapely.linestrings(
+            np.concatenate(self._pending_coords),
+            indices=np.repeat(np.arange(len(counts)), counts),
         )
 
-        mw = osm.osm.mutable.Way(w)
-        tags = {t.k: t.v for t in w.tags}
-        tags["avoid_zone"] = "yes"
-        tags["avoid_factor"] = f"{factor:.4f}"
-        mw.tags = [osm.osm.Tag(k, v) for k, v in tags.items()]
-        self.w.add_way(mw)
+        # Fan the predicate work out over threads: tree queries are
+        # read-only and run without the GIL, so sub-batches classify on
+        # separate cores while this thread only pays the split/concat.
+        if self._pool is not None and len(lines) >= 2 * CLASSIFY_THREADS:
+            chunks = np.array_split(lines, CLASSIFY_THREADS)
+            factors = np.concatenate(list(self._pool.map(self._classify, chunks)))
+        else:
+            factors = self._classify(lines)
+
+        for mw, factor in zip(self._pending_ways, factors):
+            if not factor:
+                self.w.add_way(mw)
+                continue
+            self._penalized_count += 1
+            inside = factor == INSIDE_FACTOR
+            logger.debug(
+                "Penalizing way %d: factor=%.4f reason=%s",
+                mw.id,
+                factor,
+                "INSIDE" if inside else "TOUCHING",
+            )
+            # mw.tags is already this handler's own tuple list, so the
+            # precomputed pairs append in place without rebuilding it.
+            mw.tags += _INSIDE_TAGS if inside else _TOUCH_TAGS
+            self.w.add_way(mw)
+
+        self._pending_ways.clear()
+        self._pending_coords.clear()
 
 
 def apply_penalties(
@@ -156,29 +304,41 @@ def apply_penalties(
     logger.info("Loaded %d avoid zone polygons", len(polys))
     logger.info("Starting PBF processing: input=%s output=%s location_store=%s", in_pbf, out_pbf, location_store)
     
-    # Remove existing output file if it exists (osmium.io.Writer won't overwrite)
-    if out_pbf.exists():
-        out_pbf.unlink()
-        logger.info("Removed existing output file: %s", out_pbf)
-    
-    reader = osm.io.Reader(str(in_pbf))
-    writer = osm.SimpleWriter(str(out_pbf))
-    
+    # The output is scratch consumed once by osrm-extract, so skip zlib
+    # deflate (the writer thread's main cost) and object metadata, and
+    # give the writer a larger buffer to cut flush frequency.
+    out_file = osm.io.File(str(out_pbf), "pbf,pbf_compression=none,add_metadata=false")
+    writer = osm.SimpleWriter(out_file, bufsz=16 * 1024 * 1024, overwrite=True)
+    penalizer = Penalizer(writer, polys, tree)
+    storage = "dense_mmap_array" if location_store == "mmap" else "flex_mem"
+
     try:
-        if location_store == "mmap":
-            index = osm.index.create_map("dense_mmap_array")
-        else:
-            index = osm.index.create_map("flex_mem")
-        
-        lhandler = osm.NodeLocationsForWays(index)
-        penalizer = Penalizer(writer, polys, tree)
-        osm.apply(reader, lhandler, penalizer)
+        # Everything the filters reject — all nodes, and ways without a
+        # highway/route key — flows straight from the reader to the writer
+        # inside the C++ layer; only candidate ways (and relations, which
+        # need a flush barrier) surface to Python.
+        fp = (
+            osm.FileProcessor(str(in_pbf))
+            .with_locations(storage)
+            .with_filter(osm.filter.EntityFilter(osm.osm.WAY | osm.osm.RELATION))
+            .with_filter(osm.filter.KeyFilter("highway", "route").enable_for(osm.osm.WAY))
+            .handler_for_filtered(writer)
+        )
+        for obj in fp:
+            if obj.is_way():
+                penalizer.way(obj)
+            else:
+                # Relations follow ways in a sorted PBF; drain the buffer
+                # before the first one is written.
+                penalizer.flush()
+                writer.add(obj)
+        penalizer.flush()
     finally:
+        penalizer.close()
         writer.close()
-        reader.close()
-    
+
     logger.info(
-        "Finished PBF processing. Total ways: %d, Penalized ways: %d", 
+        "Finished PBF processing. Candidate ways: %d, Penalized ways: %d", 
         penalizer._way_count,
         penalizer._penalized_count
     )
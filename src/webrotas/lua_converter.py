@@ -5,7 +5,11 @@ This allows the Lua profile to access polygon data at startup without
 reprocessing the PBF file.
 """
 
-import json
+import mmap
+import os
+
+import numpy as np
+import orjson
 from pathlib import Path
 from typing import Dict, Any, List
 import logging
@@ -26,7 +30,14 @@ def geojson_to_lua_data(geojson_path: Path) -> str:
         Lua code string defining the avoid_zones_data table
     """
     try:
-        gj = json.loads(geojson_path.read_text(encoding="utf-8"))
+        # Parse through a read-only mmap so orjson works off the page
+        # cache directly instead of a full bytes copy of the file.
+        with open(geojson_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                logger.warning("Empty GeoJSON file")
+                return "return {}"
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                gj = orjson.loads(memoryview(mm))
     except Exception as e:
         logger.error(f"Failed to read GeoJSON: {e}")
         return "return {}"
@@ -55,23 +66,35 @@ def geojson_to_lua_data(geojson_path: Path) -> str:
         logger.warning("No valid polygons found in GeoJSON")
         return "return {}"
 
-    # Generate Lua table
-    lua_code = "-- Auto-generated avoid zones data\n"
-    lua_code += "return {\n"
-
-    for i, polygon in enumerate(polygons):
-        lua_code += f"  {{\n"
-        lua_code += f"    coords = {{\n"
-        for lon, lat in polygon:
-            lua_code += f"      {{{lon}, {lat}}},\n"
-        lua_code += f"    }},\n"
-        lua_code += f"    is_inside = true,\n"
-        lua_code += f"    is_touching = true,\n"
-        lua_code += f"  }},\n"
-
-    lua_code += "}\n"
-
-    return lua_code
+    # Generate Lua table as a fragment list joined once at the end:
+    # repeated += on a growing string re-copies the whole buffer and turns
+    # quadratic once the chunk no longer fits CPython's in-place resize.
+    parts = ["-- Auto-generated avoid zones data\n", "return {\n"]
+    append = parts.append
+
+    for polygon in polygons:
+        append("  {\n")
+        append("    coords = {\n")
+        # Format the whole ring with vectorized numpy string ops rather
+        # than one f-string per vertex; 7 decimals keeps ~1 cm precision.
+        arr = np.asarray(polygon, dtype=np.float64)[:, :2]
+        cols = np.char.mod("%.7f", arr)
+        rows = np.char.add(
+            np.char.add(
+                np.char.add("      {", cols[:, 0]),
+                np.char.add(", ", cols[:, 1]),
+            ),
+            "},\n",
+        )
+        append("".join(rows))
+        append("    },\n")
+        append("    is_inside = true,\n")
+        append("    is_touching = true,\n")
+        append("  },\n")
+
+    append("}\n")
+
+    return "".join(parts)
 
 
 def write_lua_zones_file(geojson_path: Path, lua_output_path: Path) -> bool:
@@ -5,61 +5,247 @@ Implements sequential versioning (v1, v2, v3...) without timestamps
 and provides deduplication of identical configurations.
 """
 
-import json
+import functools
+import gzip
+import hashlib
 import logging
+import mmap
+import os
 from pathlib import Path
 from typing import Dict, Any, Optional, Tuple
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
+# History files are machine-consumed (revert endpoint), so they are written
+# compact by default. Set AVOIDZONES_PRETTY_HISTORY=1 to get indented files
+# for manual inspection.
+PRETTY_HISTORY = os.getenv("AVOIDZONES_PRETTY_HISTORY", "0") == "1"
+
+# Coordinate-dense GeoJSON gzips 5-10x; set AVOIDZONES_COMPRESS_HISTORY=1
+# to store new versions as vN.geojson.gz. Readers handle both layouts by
+# suffix, so the flag can be flipped on an existing history directory.
+COMPRESS_HISTORY = os.getenv("AVOIDZONES_COMPRESS_HISTORY", "0") == "1"
+
+# Both on-disk layouts a version file may use.
+_VERSION_GLOBS = ("v*.geojson", "v*.geojson.gz")
+
+
+def _iter_version_files(history_dir: Path):
+    """Yield (version_number, path) for every version file, either layout."""
+    for pattern in _VERSION_GLOBS:
+        for f in history_dir.glob(pattern):
+            try:
+                yield int(f.name.split(".", 1)[0][1:]), f
+            except ValueError:
+                continue
+
 
-def _normalize_geojson_for_comparison(geojson: Dict[str, Any]) -> str:
+def _find_version_file(history_dir: Path, stem: str) -> Optional[Path]:
+    """Return the on-disk file for a version stem like "v3", if present."""
+    for suffix in (".geojson", ".geojson.gz"):
+        candidate = history_dir / f"{stem}{suffix}"
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def read_version_bytes(path: Path) -> bytes:
+    """Read a version file's JSON bytes, decompressing by suffix."""
+    data = Path(path).read_bytes()
+    if str(path).endswith(".gz"):
+        data = gzip.decompress(data)
+    return data
+
+
+def _geojson_digest(geojson: Dict[str, Any]) -> str:
     """
-    Normalize GeoJSON to a comparable string form.
-    
-    Sorts features and coordinates consistently to enable comparison.
+    Compute a 16-byte blake2b hex digest of the canonical GeoJSON form.
+
+    Each feature is hashed to a fixed 16-byte digest from its canonical
+    serialization; the sorted digests are folded into an outer hash
+    together with the collection's non-feature keys. Sorting 16-byte
+    digests makes the result feature-order independent without ordering
+    the features themselves, which compared (and kept alive) the full
+    serialized blobs of every feature at once.
     """
-    # Create a copy to avoid modifying the original
-    normalized = json.loads(json.dumps(geojson))
-    
-    # Sort features by their stringified geometry for consistency
-    if normalized.get("type") == "FeatureCollection":
-        normalized["features"] = sorted(
-            normalized["features"],
-            key=lambda f: json.dumps(f, sort_keys=True, separators=(',', ':'))
-        )
-    
-    # Return canonical JSON string
-    return json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    if geojson.get("type") != "FeatureCollection":
+        canonical = orjson.dumps(geojson, option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(canonical, digest_size=16).hexdigest()
+
+    feature_digests = sorted(
+        hashlib.blake2b(
+            orjson.dumps(f, option=orjson.OPT_SORT_KEYS), digest_size=16
+        ).digest()
+        for f in geojson.get("features", [])
+    )
+    outer = hashlib.blake2b(digest_size=16)
+    # Non-feature keys (crs, bbox, ...) still distinguish collections,
+    # but the common {"type", "features"}-only document streams a
+    # constant header instead of rebuilding and serializing a dict.
+    if geojson.keys() <= {"type", "features"}:
+        outer.update(b'{"type":"FeatureCollection"}')
+    else:
+        rest = {k: v for k, v in geojson.items() if k != "features"}
+        outer.update(orjson.dumps(rest, option=orjson.OPT_SORT_KEYS))
+    for d in feature_digests:
+        outer.update(d)
+    return outer.hexdigest()
+
+
+# Sidecar cache of per-version digests, so a duplicate check does not
+# re-read and re-hash every history file. Entries carry the source file's
+# mtime_ns and are re-derived when it disagrees.
+DIGEST_CACHE_NAME = ".digests.json"
+
+# Identifier of the digest scheme (blake2b-128 over the per-feature digest
+# fold). Cached entries tagged with a different scheme are re-derived, so
+# the hash primitive or canonical form can change without stale digests
+# suppressing or missing duplicates.
+DIGEST_ALGO = "b2f"
+
+
+def _load_digest_cache(history_dir: Path) -> Dict[str, str]:
+    """
+    Return {version_stem: digest} for all history files, kept in sync.
+
+    Reads the sidecar cache, drops entries whose files are gone,
+    re-digests files whose mtime changed, and fills in missing ones.
+    The refreshed cache is written back when anything changed.
+    """
+    cache_path = history_dir / DIGEST_CACHE_NAME
+    try:
+        cache = orjson.loads(cache_path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        cache = {}
+
+    digests: Dict[str, str] = {}
+    changed = False
+    seen = set()
+    for version_num, f in _iter_version_files(history_dir):
+        stem = f"v{version_num}"
+        seen.add(stem)
+        mtime_ns = f.stat().st_mtime_ns
+        entry = cache.get(stem)
+        if (
+            entry
+            and entry.get("mtime_ns") == mtime_ns
+            and entry.get("algo") == DIGEST_ALGO
+        ):
+            digests[stem] = entry["digest"]
+            continue
+        try:
+            digest = _geojson_digest(orjson.loads(read_version_bytes(f)))
+        except (OSError, orjson.JSONDecodeError, gzip.BadGzipFile) as e:
+            logger.warning(f"Failed to digest version file {f}: {e}")
+            continue
+        cache[stem] = {"digest": digest, "mtime_ns": mtime_ns, "algo": DIGEST_ALGO}
+        digests[stem] = digest
+        changed = True
+
+    stale = [stem for stem in cache if stem not in seen]
+    for stem in stale:
+        del cache[stem]
+        changed = True
+
+    if changed:
+        try:
+            cache_path.write_bytes(orjson.dumps(cache))
+        except OSError as e:
+            logger.warning(f"Failed to write digest cache: {e}")
+
+    return digests
+
+
+def _record_digest(history_dir: Path, version_file: Path, digest: str) -> None:
+    """Add a freshly saved version's digest to the sidecar cache."""
+    cache_path = history_dir / DIGEST_CACHE_NAME
+    try:
+        cache = orjson.loads(cache_path.read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        cache = {}
+    version_filename = version_file.name.split(".", 1)[0]
+    try:
+        cache[version_filename] = {
+            "digest": digest,
+            "mtime_ns": version_file.stat().st_mtime_ns,
+            "algo": DIGEST_ALGO,
+        }
+        cache_path.write_bytes(orjson.dumps(cache))
+    except OSError as e:
+        logger.warning(f"Failed to update digest cache: {e}")
+
+
+# Manifest recording the highest allocated version number plus per-version
+# metadata ("entries": {stem: {size_bytes, features_count}}), so the common
+# save/resolve path costs one small read instead of a directory scan and
+# list_versions does not have to re-parse every history file.
+MANIFEST_NAME = "manifest.json"
+
+
+def _read_manifest(history_dir: Path) -> Optional[Dict[str, Any]]:
+    """Read the history manifest, or None if missing/corrupt."""
+    try:
+        manifest = orjson.loads((history_dir / MANIFEST_NAME).read_bytes())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+    return manifest if isinstance(manifest, dict) else None
+
+
+def _fsync_dir(path: Path) -> None:
+    """fsync a directory so freshly created/renamed names are durable."""
+    try:
+        fd = os.open(path, os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_manifest(history_dir: Path, manifest: Dict[str, Any]) -> None:
+    """Write the history manifest atomically via a temp file + rename."""
+    tmp = history_dir / f"{MANIFEST_NAME}.tmp"
+    try:
+        tmp.write_bytes(orjson.dumps(manifest))
+        os.replace(tmp, history_dir / MANIFEST_NAME)
+    except OSError as e:
+        logger.warning(f"Failed to write history manifest: {e}")
 
 
 def find_next_version_number(history_dir: Path) -> int:
     """
     Find the next sequential version number.
-    
-    Scans the history directory for existing versioned files (v1.geojson, v2.geojson, etc.)
-    and returns the next number.
-    
+
+    Consults the manifest first (one small read) and falls back to scanning
+    the history directory for versioned files (v1.geojson, v2.geojson, etc.)
+    when the manifest is missing or stale.
+
     Args:
         history_dir: Path to the history directory
-        
+
     Returns:
         Next sequential version number (starting from 1)
     """
     if not history_dir.exists():
         return 1
-    
+
+    manifest = _read_manifest(history_dir)
+    if manifest is not None:
+        latest = manifest.get("latest")
+        # Trust the manifest only while its latest file is still on disk;
+        # otherwise rebuild from the directory contents below.
+        if isinstance(latest, int) and _find_version_file(history_dir, f"v{latest}"):
+            return latest + 1
+
     max_version = 0
-    for f in history_dir.glob("v*.geojson"):
-        try:
-            # Extract version number from filename like "v123.geojson"
-            version_str = f.stem[1:]  # Remove 'v' prefix
-            version_num = int(version_str)
-            max_version = max(max_version, version_num)
-        except (ValueError, IndexError):
-            # Skip files that don't match pattern
-            continue
-    
+    for version_num, _ in _iter_version_files(history_dir):
+        max_version = max(max_version, version_num)
+
     return max_version + 1
 
 
@@ -79,41 +265,62 @@ def find_duplicate_version(
     """
     if not history_dir.exists():
         return None
-    
-    new_canonical = _normalize_geojson_for_comparison(new_geojson)
-    
-    # Check all versioned files
-    for f in sorted(history_dir.glob("v*.geojson")):
-        try:
-            existing_geojson = json.loads(f.read_text(encoding="utf-8"))
-            existing_canonical = _normalize_geojson_for_comparison(existing_geojson)
-            
-            if new_canonical == existing_canonical:
-                return f.stem  # Return filename without .geojson
-        except (json.JSONDecodeError, IOError) as e:
-            logger.warning(f"Failed to read version file {f}: {e}")
-            continue
-    
-    return None
+
+    return _find_duplicate_by_digest(_geojson_digest(new_geojson), history_dir)
+
+
+def _find_duplicate_by_digest(digest: str, history_dir: Path) -> Optional[str]:
+    """Return the oldest history version whose digest matches, if any."""
+    # Invert the cache into digest -> version: iterating stems in version
+    # order makes setdefault keep the oldest match (what the sorted file
+    # scan used to return), and the lookup itself is a single dict get.
+    digests = _load_digest_cache(history_dir)
+    by_digest: Dict[str, str] = {}
+    for stem in sorted(digests, key=lambda s: int(s[1:])):
+        by_digest.setdefault(digests[stem], stem)
+    return by_digest.get(digest)
+
+
+def _validate_collection(geojson: Dict[str, Any]) -> None:
+    """
+    Validate the FeatureCollection shape required for a history save.
+
+    Straight-line checks against the two required invariants: collection
+    type and a non-empty features list. Anything deeper (geometry
+    validity) is the spatial index's concern, which warns and drops bad
+    geometries instead of rejecting the whole document.
+
+    Raises:
+        ValueError: If the document is not a usable FeatureCollection
+    """
+    if geojson.get("type") != "FeatureCollection":
+        raise ValueError("Expected FeatureCollection")
+    features = geojson.get("features")
+    if not isinstance(features, list) or not features:
+        raise ValueError("FeatureCollection must contain at least one feature")
 
 
 def save_version(
     geojson: Dict[str, Any],
     history_dir: Path,
-    check_duplicates: bool = True
+    check_duplicates: bool = True,
+    payload: Optional[bytes] = None,
 ) -> Tuple[str, bool]:
     """
     Save a new version of avoid zones GeoJSON.
-    
+
     Implements versioning scheme (v1.geojson, v2.geojson, etc.) with optional
     deduplication. If a duplicate is found and check_duplicates is True,
     returns the existing version instead of creating a new one.
-    
+
     Args:
         geojson: The GeoJSON FeatureCollection to save
         history_dir: Path to the history directory
         check_duplicates: If True, check for duplicates and reuse existing version
-        
+        payload: Already-encoded JSON bytes of the same geojson (e.g. the raw
+            request body); written as-is to skip re-serialization. Ignored
+            when PRETTY_HISTORY is set.
+
     Returns:
         Tuple of (filename_without_extension, is_new_version)
         - filename_without_extension: e.g., "v5" (without .geojson)
@@ -122,49 +329,116 @@ def save_version(
     Raises:
         ValueError: If GeoJSON is invalid
     """
-    # Validate GeoJSON
-    if geojson.get("type") != "FeatureCollection":
-        raise ValueError("Expected FeatureCollection")
-    
-    if not geojson.get("features"):
-        raise ValueError("FeatureCollection must contain at least one feature")
-    
+    _validate_collection(geojson)
+
     # Create history directory if needed
     history_dir.mkdir(parents=True, exist_ok=True)
     
-    # Check for duplicates
+    # Canonical hashing is only paid for when its result is used: with
+    # check_duplicates=False the save skips both the digest and the
+    # sidecar update, and the cache backfills lazily from the file the
+    # next time a duplicate check syncs it.
+    digest = None
     if check_duplicates:
-        duplicate = find_duplicate_version(geojson, history_dir)
+        digest = _geojson_digest(geojson)
+        duplicate = _find_duplicate_by_digest(digest, history_dir)
         if duplicate:
             logger.info(f"Found duplicate configuration: {duplicate}")
             return duplicate, False
     
-    # Generate new version number
+    # Serialize once (unless the caller already has encoded bytes), then
+    # claim the next free version number with an exclusive create. Two
+    # concurrent saves that both scanned the same max version would
+    # otherwise silently overwrite each other.
+    if PRETTY_HISTORY:
+        payload = orjson.dumps(geojson, option=orjson.OPT_INDENT_2)
+    elif payload is None:
+        payload = orjson.dumps(geojson)
+    if COMPRESS_HISTORY:
+        payload = gzip.compress(payload, compresslevel=6)
+    suffix = ".geojson.gz" if COMPRESS_HISTORY else ".geojson"
+
     next_version = find_next_version_number(history_dir)
-    version_filename = f"v{next_version}"
-    version_file = history_dir / f"{version_filename}.geojson"
-    
-    # Save to file
-    version_file.write_text(json.dumps(geojson, indent=2), encoding="utf-8")
+    while True:
+        version_filename = f"v{next_version}"
+        version_file = history_dir / f"{version_filename}{suffix}"
+        # The number is taken if it exists under either layout (the
+        # compression flag may have been flipped mid-history).
+        if _find_version_file(history_dir, version_filename):
+            next_version += 1
+            continue
+        try:
+            with open(version_file, "xb") as f:
+                f.write(payload)
+                # One fsync for the payload itself; the directory entry is
+                # made durable by the single _fsync_dir below, after the
+                # manifest and digest sidecars have also been written.
+                f.flush()
+                os.fsync(f.fileno())
+            break
+        except FileExistsError:
+            next_version += 1
+
+    # Advance the manifest monotonically (a concurrent save may already
+    # have recorded a higher number) and record this version's metadata
+    # so list_versions can answer without re-reading the file.
+    manifest = _read_manifest(history_dir) or {}
+    if not isinstance(manifest.get("latest"), int) or manifest["latest"] < next_version:
+        manifest["latest"] = next_version
+    entries = manifest.setdefault("entries", {})
+    entries[version_filename] = {
+        "size_bytes": len(payload),
+        "features_count": len(geojson["features"]),
+    }
+    _write_manifest(history_dir, manifest)
+    if digest is not None:
+        _record_digest(history_dir, version_file, digest)
+    # One directory fsync covers the new version file's name and both
+    # sidecar renames; the sidecars themselves are rebuildable caches, so
+    # their contents are not individually fsynced.
+    _fsync_dir(history_dir)
     logger.info(f"Saved new version: {version_filename}")
-    
+
     return version_filename, True
 
 
-def load_version(version_id: Optional[str], history_dir: Path) -> Dict[str, Any]:
+def save_version_bytes(
+    raw: bytes,
+    history_dir: Path,
+    check_duplicates: bool = True,
+) -> Tuple[str, bool]:
     """
-    Load a specific version from history.
-    
+    Save already-encoded GeoJSON bytes as a new version.
+
+    Thin wrapper over save_version for callers holding the encoded
+    document (e.g. a request body): the bytes are parsed once for
+    validation and duplicate detection, then written verbatim. The
+    duplicate check still hashes the canonical form rather than the raw
+    bytes, so re-encoded or feature-reordered duplicates keep matching.
+
+    Returns:
+        Tuple of (filename_without_extension, is_new_version)
+    """
+    geojson = orjson.loads(raw)
+    return save_version(
+        geojson, history_dir, check_duplicates=check_duplicates, payload=raw
+    )
+
+
+def resolve_version_path(version_id: Optional[str], history_dir: Path) -> Path:
+    """
+    Resolve a version identifier to its history file path.
+
     Args:
         version_id: Version identifier ("latest", "v5", "5", or None for latest)
         history_dir: Path to the history directory
-        
+
     Returns:
-        Parsed GeoJSON dictionary
-        
+        Path of the version file (existence is guaranteed)
+
     Raises:
         FileNotFoundError: If version not found
-        ValueError: If invalid version format or JSON is corrupted
+        ValueError: If invalid version format
     """
     if version_id is None or version_id == "latest":
         # Find the highest version number
@@ -176,20 +450,59 @@ def load_version(version_id: Optional[str], history_dir: Path) -> Dict[str, Any]
         # Normalize version_id format
         if not version_id.startswith("v"):
             version_id = f"v{version_id}"
-        
+
         # Validate format to prevent directory traversal
         if "." in version_id or "/" in version_id or "\\" in version_id:
             raise ValueError(f"Invalid version format: {version_id}")
-    
-    file_path = history_dir / f"{version_id}.geojson"
-    
-    if not file_path.exists():
+
+    file_path = _find_version_file(history_dir, version_id)
+
+    if file_path is None:
         raise FileNotFoundError(f"Version not found: {version_id}")
-    
+
+    return file_path
+
+
+def load_version(version_id: Optional[str], history_dir: Path) -> Dict[str, Any]:
+    """
+    Load a specific version from history.
+
+    Args:
+        version_id: Version identifier ("latest", "v5", "5", or None for latest)
+        history_dir: Path to the history directory
+
+    Returns:
+        Parsed GeoJSON dictionary
+
+    Raises:
+        FileNotFoundError: If version not found
+        ValueError: If invalid version format or JSON is corrupted
+    """
+    file_path = resolve_version_path(version_id, history_dir)
+    return _load_cached(str(file_path), file_path.stat().st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_cached(path_str: str, mtime_ns: int) -> Dict[str, Any]:
+    """
+    Parse a version file, memoized on (path, mtime).
+
+    Handlers reload "latest" on every request; keying the cache on the
+    file's mtime_ns serves those from memory and naturally invalidates
+    when a version file is replaced. Callers share the cached dict, so
+    it must be treated as read-only.
+
+    Plain files are parsed through a read-only mmap so orjson works off
+    the page cache without an intermediate bytes copy; gzip-stored files
+    have to materialize the decompressed buffer anyway.
+    """
     try:
-        geojson = json.loads(file_path.read_text(encoding="utf-8"))
-        return geojson
-    except json.JSONDecodeError as e:
+        if path_str.endswith(".gz"):
+            return orjson.loads(gzip.decompress(Path(path_str).read_bytes()))
+        with open(path_str, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return orjson.loads(memoryview(mm))
+    except (orjson.JSONDecodeError, gzip.BadGzipFile) as e:
         raise ValueError(f"Invalid JSON in version file: {e}")
 
 
@@ -204,39 +517,65 @@ def list_versions(history_dir: Path) -> list[Dict[str, Any]]:
         List of dicts with keys: version, filename, size_bytes, features_count
     """
     items = []
-    
+
     if not history_dir.exists():
         return items
-    
-    # Collect and sort versioned files
+
+    # Collect and sort versioned files. os.scandir caches stat results from
+    # the directory read, avoiding one extra stat syscall per entry.
     version_files = []
-    for f in history_dir.glob("v*.geojson"):
-        try:
-            version_str = f.stem[1:]  # Remove 'v' prefix
-            version_num = int(version_str)
-            version_files.append((version_num, f))
-        except (ValueError, IndexError):
-            continue
-    
+    with os.scandir(history_dir) as entries:
+        for entry in entries:
+            if not (
+                entry.name.startswith("v")
+                and entry.name.endswith((".geojson", ".geojson.gz"))
+            ):
+                continue
+            try:
+                version_num = int(entry.name.split(".", 1)[0][1:])
+            except ValueError:
+                continue
+            version_files.append((version_num, entry.name, entry.stat().st_size))
+
     # Sort by version number (descending)
     version_files.sort(key=lambda x: x[0], reverse=True)
-    
-    for version_num, file_path in version_files:
-        try:
-            stat = file_path.stat()
-            geojson = json.loads(file_path.read_text(encoding="utf-8"))
+
+    # Serve feature counts from the manifest where its recorded size still
+    # matches the file on disk; only versions written by older releases or
+    # edited out of band get re-parsed (and backfilled for next time).
+    manifest = _read_manifest(history_dir) or {}
+    entries = manifest.setdefault("entries", {})
+    backfilled = False
+
+    for version_num, filename, size_bytes in version_files:
+        stem = f"v{version_num}"
+        entry = entries.get(stem)
+        if entry and entry.get("size_bytes") == size_bytes:
+            features_count = entry["features_count"]
+        else:
+            file_path = history_dir / filename
+            try:
+                geojson = orjson.loads(read_version_bytes(file_path))
+            except (IOError, orjson.JSONDecodeError, gzip.BadGzipFile) as e:
+                logger.warning(f"Failed to read version {version_num}: {e}")
+                continue
             features_count = len(geojson.get("features", []))
-            
-            items.append({
-                "version": f"v{version_num}",
-                "filename": file_path.name,
-                "size_bytes": stat.st_size,
+            entries[stem] = {
+                "size_bytes": size_bytes,
                 "features_count": features_count,
-            })
-        except (IOError, json.JSONDecodeError) as e:
-            logger.warning(f"Failed to read version {version_num}: {e}")
-            continue
-    
+            }
+            backfilled = True
+
+        items.append({
+            "version": stem,
+            "filename": filename,
+            "size_bytes": size_bytes,
+            "features_count": features_count,
+        })
+
+    if backfilled:
+        _write_manifest(history_dir, manifest)
+
     return items
 
 
@@ -262,26 +601,29 @@ def cleanup_old_versions(history_dir: Path, keep_count: int = 0) -> int:
         return 0
     
     # Collect all versioned files
-    version_files = []
-    for f in history_dir.glob("v*.geojson"):
-        try:
-            version_str = f.stem[1:]
-            version_num = int(version_str)
-            version_files.append((version_num, f))
-        except (ValueError, IndexError):
-            continue
-    
+    version_files = list(_iter_version_files(history_dir))
+
     # Sort by version number (ascending)
     version_files.sort(key=lambda x: x[0])
     
     # Remove all but the most recent keep_count versions
     deleted_count = 0
+    deleted_stems = []
     for version_num, file_path in version_files[:-keep_count]:
         try:
             file_path.unlink()
             logger.info(f"Deleted old version: v{version_num}")
             deleted_count += 1
+            deleted_stems.append(f"v{version_num}")
         except OSError as e:
             logger.warning(f"Failed to delete version v{version_num}: {e}")
-    
+
+    # Drop the deleted versions' manifest metadata as well.
+    if deleted_stems:
+        manifest = _read_manifest(history_dir)
+        if manifest is not None and isinstance(manifest.get("entries"), dict):
+            for stem in deleted_stems:
+                manifest["entries"].pop(stem, None)
+            _write_manifest(history_dir, manifest)
+
     return deleted_count
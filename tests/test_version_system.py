@@ -22,7 +22,15 @@ from src.webrotas.version_manager import (
 
 @pytest.fixture
 def temp_history_dir():
-    """Create a temporary history directory for testing."""
+    """
+    Create a temporary history directory for testing.
+
+    Deliberately a real on-disk directory rather than a fake in-memory
+    filesystem: version_manager leans on mmap-backed reads, O_EXCL create
+    semantics, and directory fsync, which fake filesystems don't emulate
+    faithfully. /tmp is tmpfs on the usual dev/CI hosts anyway, so these
+    writes stay in RAM.
+    """
     with tempfile.TemporaryDirectory() as tmpdir:
         yield Path(tmpdir)
 